@@ -2,109 +2,332 @@ import psutil
 import subprocess
 import time
 import os
+import sys
 import csv
 import ast
-import cProfile
-import pstats
+import json
 import io
+import select
+import signal
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from contextlib import redirect_stdout
 
+from energy_kernels import CPU_WEIGHT, MEMORY_WEIGHT, TIME_WEIGHT, energy_batch
+
+# Where script_ast.py lives, for the function worker's sys.path
+HELPER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# How often a running script is sampled for CPU time and RSS (seconds)
+POLL_INTERVAL = 0.01
+
+# Runs inside one subprocess per script: executes the script once, then calls
+# every zero-argument function it defines and prints one JSON line per function.
+# Usage numbers come from the worker's own CPU time and RSS, so the collector's
+# process never shows up in the measurements.
+FUNCTION_WORKER = r"""
+import ast, contextlib, inspect, io, json, os, signal, sys, time
+
+FUNCTION_TIMEOUT = 10
+
+class Timeout(Exception):
+    pass
+
+def expire(signum, frame):
+    raise Timeout()
+
+# One slow function should not cost the rest of the script's measurements
+can_alarm = hasattr(signal, "setitimer")
+if can_alarm:
+    signal.signal(signal.SIGALRM, expire)
+
+import psutil
+_proc = psutil.Process()
+
+# Current RSS, as the analyzer measures it: ru_maxrss is a high-water mark, so
+# after the first big function every later delta would read as zero
+def usage():
+    return time.process_time(), _proc.memory_info().rss / 1024 / 1024
+
+def takes_no_args(fn):
+    try:
+        params = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return all(p.default is not p.empty or p.kind in (p.VAR_POSITIONAL, p.VAR_KEYWORD)
+               for p in params)
+
+helper_dir, script_path, names = sys.argv[1], sys.argv[2], sys.argv[3:]
+sys.path.insert(0, helper_dir)
+from script_ast import strip_toplevel_calls
+
+with open(script_path) as f:
+    tree = ast.parse(f.read(), script_path, type_comments=False,
+                     feature_version=sys.version_info[:2])
+# Bare calls of the script's own functions are its demo run; only the definitions are needed
+code = compile(strip_toplevel_calls(tree), script_path, "exec")
+namespace = {
+    "__name__": os.path.splitext(os.path.basename(script_path))[0],
+    "__file__": script_path,
+}
+out = sys.stdout
+
+with contextlib.redirect_stdout(io.StringIO()):
+    exec(code, namespace)
+    for name in names:
+        fn = namespace.get(name)
+        if not callable(fn) or not takes_no_args(fn):
+            continue
+        cpu0, mem0 = usage()
+        t0 = time.perf_counter()
+        try:
+            if can_alarm:
+                signal.setitimer(signal.ITIMER_REAL, FUNCTION_TIMEOUT)
+            fn()
+        except Exception:
+            continue
+        finally:
+            if can_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        t1 = time.perf_counter()
+        cpu1, mem1 = usage()
+        exec_time = t1 - t0
+        out.write(json.dumps({
+            "function": name,
+            "cpu_usage": 100 * (cpu1 - cpu0) / max(exec_time, 1e-9),
+            "memory_usage": max(mem1 - mem0, 0),
+            "exec_time": exec_time,
+        }) + "\n")
+"""
+
+SCRIPT_CSV = "data/code_metrics.csv"
+FUNCTION_CSV = "data/function_metrics.csv"
+SCRIPT_FIELDS = ['script', 'cpu_usage', 'memory_usage', 'exec_time', 'energy_cost']
+FUNCTION_FIELDS = ['script', 'function', 'cpu_usage', 'memory_usage', 'exec_time', 'energy_cost']
+
+def python_flags(tree):
+    """Interpreter flags for timing a script: skip site/env setup if it only imports the stdlib"""
+    override = os.environ.get("ENERGY_PYTHON_FLAGS")
+    if override is not None:
+        return override.split()
+    stdlib = getattr(sys, "stdlib_module_names", None)
+    if stdlib is None or tree is None:
+        return []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module or ''] if not node.level else ['']
+        else:
+            continue
+        if any(m.split('.')[0] not in stdlib for m in modules):
+            # Third-party code lives in site-packages, so keep the normal startup
+            return []
+    # -S skips site.py and .pth processing, -E ignores PYTHON* env vars
+    return ["-S", "-E"]
+
+def _pin_worker(counter, cpus):
+    """Pin each pool worker to its own CPU so parallel measurements don't share a core"""
+    with counter.get_lock():
+        slot = counter.value
+        counter.value += 1
+    try:
+        os.sched_setaffinity(0, {cpus[slot % len(cpus)]})
+    except OSError:
+        pass
+
+def _profile_one(script_path):
+    """Collect script- and function-level metrics for one script (pool task)"""
+    collector = EnergyDataCollector()
+    
+    # Keep the per-script messages together so the parent can print them in order
+    log = io.StringIO()
+    with redirect_stdout(log):
+        script_metrics = collector.collect_script_metrics(script_path)
+        functions = collector.extract_functions(script_path)
+        func_results = collector.profile_functions(script_path, functions)
+    return script_metrics, functions, func_results, log.getvalue()
+
 class EnergyDataCollector:
     def __init__(self, scripts_folder="test_scripts"):
         self.scripts_folder = scripts_folder
-        self.script_results = []
-        self.function_results = []
+        self.script_count = 0
+        self.function_count = 0
+        
+        self._script_cache = {}
+    
+    def _load_script(self, path):
+        """Read and parse a script once, cached by (path, mtime)"""
+        key = (path, os.path.getmtime(path))
+        cached = self._script_cache.get(key)
+        if cached is None:
+            with open(path, 'r') as f:
+                source = f.read()
+            tree = ast.parse(source, filename=path, type_comments=False,
+                             feature_version=sys.version_info[:2])
+            cached = (source, tree)
+            self._script_cache[key] = cached
+        return cached
     
     def extract_functions(self, filepath):
         """Extract all function names from a Python file"""
         try:
-            with open(filepath, 'r') as f:
-                tree = ast.parse(f.read())
+            _, tree = self._load_script(filepath)
             
-            functions = []
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    functions.append(node.name)
-            return functions
+            # Only module-level defs end up callable in the worker's namespace
+            return [node.name for node in tree.body if isinstance(node, ast.FunctionDef)]
         except Exception as e:
             print(f"      Error parsing functions: {e}")
             return []
     
-    def profile_function(self, script_path, function_name):
-        """Profile a specific function using cProfile"""
+    def profile_functions(self, script_path, function_names):
+        """Profile all zero-argument functions of a script in one worker subprocess"""
+        if not function_names:
+            return []
+        
         try:
-            with open(script_path, 'r') as f:
-                code = f.read()
-            
-            namespace = {}
-            exec(code, namespace)
-            
-            if function_name not in namespace:
-                return None
-            
-            func = namespace[function_name]
-            profiler = cProfile.Profile()
-            
-            # Measure metrics
-            start_time = time.time()
-            cpu_before = psutil.cpu_percent(interval=0.1)
-            mem_before = psutil.Process().memory_info().rss / 1024 / 1024
-            
-            profiler.enable()
+            result = subprocess.run(
+                [sys.executable, "-c", FUNCTION_WORKER, HELPER_DIR, script_path, *function_names],
+                capture_output=True,
+                text=True,
+                timeout=30
+            )
+        except subprocess.TimeoutExpired:
+            print(f"      ⏱️  Function profiling timeout (skipped)")
+            return []
+        
+        results = []
+        for line in result.stdout.splitlines():
             try:
-                func()
-            except TypeError:
-                # Function needs arguments - skip
-                return None
-            except Exception as e:
-                return None
-            profiler.disable()
+                metrics = json.loads(line)
+            except ValueError:
+                # Stray output written past the worker's stdout redirect
+                continue
             
-            cpu_after = psutil.cpu_percent(interval=0.1)
-            mem_after = psutil.Process().memory_info().rss / 1024 / 1024
-            exec_time = time.time() - start_time
-            
-            cpu_usage = max(cpu_after - cpu_before, 0)
-            memory_usage = max(mem_after - mem_before, 0)
-            
-            # Calculate energy cost
-            energy = (cpu_usage * 0.5) + (memory_usage * 0.3) + (exec_time * 100 * 0.2)
-            
-            return {
+            results.append({
                 'script': os.path.basename(script_path),
-                'function': function_name,
-                'cpu_usage': cpu_usage,
-                'memory_usage': memory_usage,
-                'exec_time': exec_time,
-                'energy_cost': energy
-            }
-            
-        except Exception as e:
-            return None
+                'function': metrics['function'],
+                'cpu_usage': metrics['cpu_usage'],
+                'memory_usage': metrics['memory_usage'],
+                'exec_time': metrics['exec_time']
+            })
+        
+        # Calculate energy cost for the whole script in one batch
+        if results:
+            energies = energy_batch(
+                [r['cpu_usage'] for r in results],
+                [r['memory_usage'] for r in results],
+                [r['exec_time'] for r in results]
+            )
+            for r, energy in zip(results, energies.tolist()):
+                r['energy_cost'] = energy
+        return results
+    
+    def _watch_child(self, proc, timeout):
+        """Poll a running child until it exits; returns (cpu seconds, peak RSS MB)"""
+        deadline = time.perf_counter() + timeout
+        cpu_time = peak_rss = 0
+        try:
+            child = psutil.Process(proc.pid)
+            while proc.poll() is None:
+                if time.perf_counter() > deadline:
+                    proc.kill()
+                    proc.wait()
+                    raise subprocess.TimeoutExpired(proc.args, timeout)
+                with child.oneshot():
+                    ct = child.cpu_times()
+                    rss = child.memory_info().rss
+                cpu_time = ct.user + ct.system
+                peak_rss = max(peak_rss, rss)
+                time.sleep(POLL_INTERVAL)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            # Exited (or became a zombie) between polls
+            proc.wait()
+        return cpu_time, peak_rss / 1024 / 1024
+    
+    def _spawn_and_wait(self, argv, timeout):
+        """posix_spawn a child with output discarded; returns (cpu seconds, sampled peak RSS MB)"""
+        # Skips subprocess's fd-closing loop and pipe setup; spawn uses vfork on Linux
+        discard = [(os.POSIX_SPAWN_OPEN, fd, os.devnull, os.O_WRONLY, 0) for fd in (1, 2)]
+        pid = os.posix_spawn(argv[0], argv, os.environ, file_actions=discard)
+        
+        deadline = time.perf_counter() + timeout
+        reaped = False
+        pidfd = None
+        peak_rss = 0
+        try:
+            # A pidfd turns readable the moment the child exits; without one, poll
+            try:
+                pidfd = os.pidfd_open(pid)
+            except (AttributeError, OSError):
+                pass
+            try:
+                child = psutil.Process(pid)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                child = None
+            while True:
+                done, _, usage = os.wait4(pid, os.WNOHANG)
+                if done:
+                    reaped = True
+                    break
+                # wait4's ru_maxrss starts at the parent's RSS at exec time (this
+                # worker's, NumPy and all), so the script's own peak is sampled instead
+                if child is not None:
+                    try:
+                        peak_rss = max(peak_rss, child.memory_info().rss)
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        child = None
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(argv, timeout)
+                if pidfd is not None:
+                    select.select([pidfd], [], [], min(POLL_INTERVAL, remaining))
+                else:
+                    time.sleep(min(POLL_INTERVAL, remaining))
+        finally:
+            if pidfd is not None:
+                os.close(pidfd)
+            # Only killed while unreaped, so the pid can't have been reused yet
+            if not reaped:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                os.wait4(pid, 0)
+        # Kernel-accounted CPU time is exact; polling would miss the last interval
+        return usage.ru_utime + usage.ru_stime, peak_rss / 1024 / 1024
     
     def collect_script_metrics(self, script_path):
         """Collect metrics for entire script"""
         try:
-            start_time = time.time()
-            cpu_before = psutil.cpu_percent(interval=0.1)
-            mem_before = psutil.virtual_memory().percent
-            
-            # Run script
-            result = subprocess.run(
-                ["python", script_path], 
-                capture_output=True, 
-                timeout=10
-            )
+            try:
+                flags = python_flags(self._load_script(script_path)[1])
+            except (OSError, SyntaxError, ValueError):
+                flags = []
             
-            cpu_after = psutil.cpu_percent(interval=0.1)
-            mem_after = psutil.virtual_memory().percent
-            exec_time = time.time() - start_time
+            argv = [sys.executable, *flags, script_path]
             
-            cpu_usage = max(cpu_after, cpu_before)
-            memory_usage = max(mem_after, mem_before)
+            if hasattr(os, "posix_spawn"):
+                # wait4 reports this one child's own CPU time, so no deltas are needed
+                t0 = time.perf_counter()
+                cpu_time, memory_usage = self._spawn_and_wait(argv, timeout=10)
+                exec_time = time.perf_counter() - t0
+            else:
+                t0 = time.perf_counter()
+                
+                # Run script, sampling the child itself while it runs
+                proc = subprocess.Popen(
+                    argv,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+                cpu_time, memory_usage = self._watch_child(proc, timeout=10)
+                
+                exec_time = time.perf_counter() - t0
+            cpu_usage = 100 * cpu_time / max(exec_time, 1e-9)
             
             # Calculate energy
-            energy = (cpu_usage * 0.5) + (memory_usage * 0.3) + (exec_time * 100 * 0.2)
+            energy = (cpu_usage * CPU_WEIGHT) + (memory_usage * MEMORY_WEIGHT) + (exec_time * TIME_WEIGHT)
             
             return {
                 'script': os.path.basename(script_path),
@@ -140,60 +363,80 @@ class EnergyDataCollector:
         
         print(f"📂 Found {len(script_files)} scripts to analyze\n")
         
-        for idx, file in enumerate(script_files, 1):
-            script_path = os.path.join(self.scripts_folder, file)
-            print(f"[{idx}/{len(script_files)}] 📄 {file}")
-            
-            # Collect script-level metrics
-            script_metrics = self.collect_script_metrics(script_path)
-            if script_metrics:
-                self.script_results.append(script_metrics)
-                print(f"      ✓ Script: {script_metrics['energy_cost']:.2f} units")
-            
-            # Extract and profile functions
-            functions = self.extract_functions(script_path)
-            if functions:
-                print(f"      📊 Functions: {len(functions)}")
-                for func_name in functions:
-                    func_metrics = self.profile_function(script_path, func_name)
-                    if func_metrics:
-                        self.function_results.append(func_metrics)
-                        print(f"         ✓ {func_name}() → {func_metrics['energy_cost']:.2f} units")
-            
-            print()
+        # Every script runs in its own subprocesses, so scripts are profiled in
+        # parallel with each pool worker pinned to one CPU where supported
+        if hasattr(os, "sched_setaffinity"):
+            cpus = sorted(os.sched_getaffinity(0))
+            max_workers = len(cpus)
+            initializer, initargs = _pin_worker, (multiprocessing.Value('i', 0), cpus)
+        else:
+            max_workers = os.cpu_count()
+            initializer, initargs = None, ()
         
-        # Save results
-        self.save_results()
+        # Rows are written as they arrive so a crash keeps everything collected so far
+        self._open_writers()
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=initializer,
+                                     initargs=initargs) as executor:
+                futures = {
+                    executor.submit(_profile_one, os.path.join(self.scripts_folder, file)): file
+                    for file in script_files
+                }
+                
+                for idx, future in enumerate(as_completed(futures), 1):
+                    file = futures[future]
+                    script_metrics, functions, func_results, log = future.result()
+                    print(f"[{idx}/{len(script_files)}] 📄 {file}")
+                    print(log, end='')
+                    
+                    # Script-level metrics
+                    if script_metrics:
+                        self._script_writer.writerow(script_metrics)
+                        self._script_csv.flush()
+                        self.script_count += 1
+                        print(f"      ✓ Script: {script_metrics['energy_cost']:.2f} units")
+                    
+                    # Function-level metrics
+                    if functions:
+                        print(f"      📊 Functions: {len(functions)}")
+                        self._function_writer.writerows(func_results)
+                        self._function_csv.flush()
+                        self.function_count += len(func_results)
+                        for func_metrics in func_results:
+                            print(f"         ✓ {func_metrics['function']}() → {func_metrics['energy_cost']:.2f} units")
+                    
+                    print()
+        finally:
+            self.save_results()
+    
+    def _open_writers(self):
+        """Create data/ and open both CSV files with their headers written"""
+        os.makedirs("data", exist_ok=True)
+        
+        self._script_csv = open(SCRIPT_CSV, "w", newline="")
+        self._script_writer = csv.DictWriter(self._script_csv, fieldnames=SCRIPT_FIELDS)
+        self._script_writer.writeheader()
+        
+        self._function_csv = open(FUNCTION_CSV, "w", newline="")
+        self._function_writer = csv.DictWriter(self._function_csv, fieldnames=FUNCTION_FIELDS)
+        self._function_writer.writeheader()
     
     def save_results(self):
-        """Save results to CSV files"""
+        """Close the CSV files and print a summary"""
+        self._script_csv.close()
+        self._function_csv.close()
+        
         print("=" * 70)
         print("💾 SAVING RESULTS")
         print("=" * 70)
         print()
         
-        # Create data directory
-        os.makedirs("data", exist_ok=True)
+        if self.script_count:
+            print(f"✅ {SCRIPT_CSV} ({self.script_count} records)")
+        if self.function_count:
+            print(f"✅ {FUNCTION_CSV} ({self.function_count} records)")
         
-        # Save script-level data
-        if self.script_results:
-            script_path = "data/code_metrics.csv"
-            with open(script_path, "w", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=['script', 'cpu_usage', 'memory_usage', 'exec_time', 'energy_cost'])
-                writer.writeheader()
-                writer.writerows(self.script_results)
-            print(f"✅ {script_path} ({len(self.script_results)} records)")
-        
-        # Save function-level data
-        if self.function_results:
-            func_path = "data/function_metrics.csv"
-            with open(func_path, "w", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=['script', 'function', 'cpu_usage', 'memory_usage', 'exec_time', 'energy_cost'])
-                writer.writeheader()
-                writer.writerows(self.function_results)
-            print(f"✅ {func_path} ({len(self.function_results)} records)")
-        
-        if not self.script_results and not self.function_results:
+        if not self.script_count and not self.function_count:
             print("⚠️  No data collected. Check your test scripts.")
         else:
             print()
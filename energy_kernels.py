@@ -0,0 +1,130 @@
+"""
+Energy cost kernels shared by the collector and the analyzer
+
+Fallback formula used when no trained model is available:
+    energy = cpu * 0.5 + memory * 0.3 + exec_time * 100 * 0.2
+
+The batch kernel is resolved on the first energy_batch call, in this order:
+    1. _energy_aot extension built ahead of time with `python energy_kernels.py`
+       (loads in milliseconds; no Numba import or JIT)
+    2. Numba JIT, compiled once and cached on disk
+    3. Plain NumPy
+Importing this module never imports Numba.
+
+predict_forest scores rows against a random forest flattened by train_model.py
+into one set of node arrays; it is JIT-compiled with Numba on first use. When
+the export carries int16 bin thresholds, rows are binned once with searchsorted
+and the traversal compares int16 bins instead of floats.
+"""
+
+import os
+
+import numpy as np
+
+CPU_WEIGHT = 0.5
+MEMORY_WEIGHT = 0.3
+TIME_WEIGHT = 100 * 0.2
+
+# Same weights as a vector, for scoring (n, 3) cpu/memory/exec_time rows with one dot product
+ENERGY_COEFFS = np.array([CPU_WEIGHT, MEMORY_WEIGHT, TIME_WEIGHT], dtype=np.float64)
+
+# Pinned signature so the kernel is compiled exactly once
+ENERGY_SIGNATURE = 'f8[:](f8[:], f8[:], f8[:])'
+
+def _energy_formula(cpu, memory, exec_time):
+    return cpu * CPU_WEIGHT + memory * MEMORY_WEIGHT + exec_time * TIME_WEIGHT
+
+_energy_kernel = None
+
+def _load_energy_kernel():
+    """Pick the AOT extension, else a Numba JIT, else the plain formula"""
+    try:
+        from _energy_aot import energy_batch as kernel
+    except ImportError:
+        try:
+            from numba import njit
+        except ImportError:
+            kernel = _energy_formula
+        else:
+            kernel = njit(ENERGY_SIGNATURE, cache=True, fastmath=True)(_energy_formula)
+    return kernel
+
+def energy_batch(cpu, memory, exec_time) -> np.ndarray:
+    """Score arrays of cpu/memory/exec_time with the fallback formula"""
+    global _energy_kernel
+    if _energy_kernel is None:
+        _energy_kernel = _load_energy_kernel()
+    return _energy_kernel(
+        np.ascontiguousarray(cpu, dtype=np.float64),
+        np.ascontiguousarray(memory, dtype=np.float64),
+        np.ascontiguousarray(exec_time, dtype=np.float64)
+    )
+
+# Swapped for numba.prange when the forest kernel is compiled; plain range otherwise
+prange = range
+
+def _forest_formula(X, feature, threshold, left, right, value, roots):
+    n_trees = roots.shape[0]
+    out = np.empty(X.shape[0])
+    for i in prange(X.shape[0]):
+        acc = 0.0
+        for t in range(n_trees):
+            node = roots[t]
+            # Leaves have left == -1; children are global node indices
+            while left[node] != -1:
+                if X[i, feature[node]] <= threshold[node]:
+                    node = left[node]
+                else:
+                    node = right[node]
+            acc += value[node]
+        out[i] = acc / n_trees
+    return out
+
+_forest_kernel = None
+
+def _bin_rows(X, edges, edge_offsets) -> np.ndarray:
+    """Map each feature value to the number of that feature's split thresholds below it"""
+    # x <= edges[k] exactly when fewer than k+1 edges are < x, so bins compare like values
+    X = np.asarray(X, dtype=np.float32)
+    Xb = np.empty(X.shape, dtype=np.int16)
+    for f in range(X.shape[1]):
+        # float32 inputs against float64 thresholds, as sklearn compares them
+        edges_f = edges[edge_offsets[f]:edge_offsets[f + 1]]
+        Xb[:, f] = np.searchsorted(edges_f, X[:, f].astype(np.float64), side='left')
+    return Xb
+
+def predict_forest(X, forest) -> np.ndarray:
+    """Average the leaf values of a flattened forest (feature/threshold/left/right/value/roots)"""
+    global _forest_kernel, prange
+    if _forest_kernel is None:
+        # Imported lazily, like the energy_batch kernel, so importing this module stays cheap
+        try:
+            import numba
+        except ImportError:
+            _forest_kernel = _forest_formula
+        else:
+            prange = numba.prange
+            _forest_kernel = numba.njit(parallel=True, cache=True)(_forest_formula)
+    if 'qthreshold' in forest:
+        X, threshold = _bin_rows(X, forest['edges'], forest['edge_offsets']), forest['qthreshold']
+    else:
+        X, threshold = np.ascontiguousarray(X, dtype=np.float32), forest['threshold']
+    return _forest_kernel(
+        X,
+        forest['feature'], threshold,
+        forest['left'], forest['right'],
+        forest['value'], forest['roots']
+    )
+
+def build_aot():
+    """Compile the batch kernel into the _energy_aot extension next to this file"""
+    from numba.pycc import CC
+
+    cc = CC('_energy_aot')
+    cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+    cc.export('energy_batch', ENERGY_SIGNATURE)(_energy_formula)
+    cc.compile()
+    print(f"✅ Built {cc.output_file} in {cc.output_dir}")
+
+if __name__ == "__main__":
+    build_aot()
@@ -12,50 +12,272 @@ Usage:
 """
 
 import psutil
-import subprocess
 import time
 import joblib
 import sys
 import os
 import ast
 import cProfile
+import functools
+import hashlib
+import io
+import marshal
+import multiprocessing as mp
+import runpy
+import signal
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, redirect_stdout
+from operator import attrgetter
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from energy_kernels import CPU_WEIGHT, ENERGY_COEFFS, MEMORY_WEIGHT, TIME_WEIGHT, predict_forest
+from script_ast import strip_toplevel_calls
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# ru_maxrss is KiB on Linux but bytes on macOS
+MAXRSS_TO_MB = 1024 * 1024 if sys.platform == "darwin" else 1024
+
+# Live monitor memory sampling period (seconds); CPU is still reported per second
+SAMPLE_INTERVAL = 0.1
+
+# sklearn trees compare in float32 internally and ONNX sessions take float32,
+# so building rows in that dtype skips a per-call conversion copy
+MODEL_DTYPE = np.float32
+
+# One script/function row of raw metrics
+METRIC_RECORD = np.dtype([('cpu', 'f8'), ('mem', 'f8'), ('t', 'f8')])
+
+# Pin the grammar to this interpreter and skip type-comment handling when parsing
+_PARSE_OPTIONS = {'type_comments': False, 'feature_version': sys.version_info[:2]}
+
+# Marshalled code objects for probed scripts (ASTs themselves can't be marshalled)
+_CACHE_DIR = Path("~/.cache/energy_predictor").expanduser()
+# Bump whenever what goes into the cached code changes (e.g. strip_toplevel_calls)
+CODE_CACHE_VERSION = 2
+
+# In-process probes have no subprocess timeout, so bound them with SIGALRM
+FUNCTION_TIMEOUT = 10
+
+class _ProbeTimeout(Exception):
+    pass
+
+@contextmanager
+def _time_limit(seconds: float):
+    """Raise _ProbeTimeout if the block runs longer than `seconds`"""
+    # SIGALRM only exists on POSIX and can only be handled on the main thread
+    if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    
+    def _expire(signum, frame):
+        raise _ProbeTimeout()
+    
+    previous = signal.signal(signal.SIGALRM, _expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _run_script(script_path: str, out_path: str, err_path: str, peak=None):
+    """Child process entry point: run a script as __main__ with its output sent to files"""
+    # A forked child's high-water mark starts at the RSS it inherited, so only
+    # the growth past that belongs to the script; reported back through `peak`
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if peak is not None else 0
+    out = open(out_path, 'w')
+    err = open(err_path, 'w')
+    # Point the real fds at the files too, so output from C extensions is captured
+    os.dup2(out.fileno(), 1)
+    os.dup2(err.fileno(), 2)
+    sys.stdout, sys.stderr = out, err
+    sys.argv = [script_path]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script_path)))
+    try:
+        runpy.run_path(script_path, run_name="__main__")
+    finally:
+        if peak is not None:
+            grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base
+            peak.value = max(grown, 0) / MAXRSS_TO_MB
+
+@functools.lru_cache(maxsize=32)
+def _load_ast(path: str, mtime: float):
+    """Read and parse a script once per (path, mtime); returns (source, tree, funcs)"""
+    with open(path, 'r') as f:
+        source = f.read()
+    tree = ast.parse(source, filename=path, **_PARSE_OPTIONS)
+    # Only module-level defs end up callable in the exec'd namespace
+    funcs = {node.name: node for node in tree.body if isinstance(node, ast.FunctionDef)}
+    return source, tree, funcs
+
+def _cached_code(path: str, mtime: float):
+    """Definitions-only code object for a script, marshalled to disk keyed by content hash"""
+    with open(path, 'rb') as f:
+        source = f.read()
+    # co_filename, the bytecode format and the stripping rules are baked in, so all are part of the key
+    digest = hashlib.blake2b(source, digest_size=16)
+    digest.update(str(CODE_CACHE_VERSION).encode())
+    digest.update(os.path.abspath(path).encode())
+    digest.update(sys.implementation.cache_tag.encode())
+    cache_file = _CACHE_DIR / f"{digest.hexdigest()}.pyc"
+    try:
+        return marshal.loads(cache_file.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    
+    # Compile from the tree _load_ast already parsed, so a cold script is parsed once
+    code = compile(strip_toplevel_calls(_load_ast(path, mtime)[1]), path, 'exec')
+    try:
+        _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(marshal.dumps(code))
+        os.replace(tmp, cache_file)
+    except OSError:
+        pass
+    return code
+
+_LOOP_NODES = (ast.For, ast.While)
+
+def _complexity_counts(func_node: ast.FunctionDef) -> tuple:
+    """Count loops and direct recursive calls in one explicit-stack pass"""
+    name = func_node.name
+    loops = recursion = 0
+    stack = [func_node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, _LOOP_NODES):
+            loops += 1
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name:
+            recursion += 1
+        stack.extend(ast.iter_child_nodes(node))
+    return loops, recursion
+
+class FunctionResult(NamedTuple):
+    """Measured or estimated metrics for one function; energy is filled in after batching"""
+    function: str
+    cpu_usage: float
+    memory_usage: float
+    exec_time: float
+    energy: float
+    estimated: bool
+
+# Per-process analyzer used by the function-probe pool
+_worker_analyzer = None
+
+def _init_function_worker(script_path: str):
+    """Pool initializer: build a model-less analyzer and exec the script once"""
+    global _worker_analyzer
+    _worker_analyzer = CompleteEnergyAnalyzer(load_model=False)
+    _worker_analyzer._script_namespace(script_path)
+
+def _analyze_function_task(script_path: str, func_name: str) -> Optional[FunctionResult]:
+    """Pool task: probe one function in this worker's cached namespace"""
+    return _worker_analyzer.analyze_function(script_path, func_name)
+
+class _OnnxModel:
+    """onnxruntime session exposing the sklearn predict() interface"""
+    
+    def __init__(self, path: str):
+        import onnxruntime as ort
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Three features per row don't need an intra-op thread pool
+        options.intra_op_num_threads = 1
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+    
+    def predict(self, X) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return self.session.run(None, {self.input_name: X})[0].ravel()
+
+class _ForestModel:
+    """Random forest flattened into node arrays, scored by energy_kernels.predict_forest"""
+    
+    def __init__(self, path: str):
+        with np.load(path) as data:
+            self.forest = {name: data[name] for name in data.files}
+    
+    def predict(self, X) -> np.ndarray:
+        return predict_forest(X, self.forest)
 
 class CompleteEnergyAnalyzer:
-    def __init__(self, model_path="models/energy_model.pkl"):
+    # Fallback model locations, checked after the path given to __init__
+    MODEL_PATHS = (
+        "models/energy_model.pkl",
+        os.path.join(os.path.dirname(__file__), "models/energy_model.pkl"),
+        os.path.expanduser("~/.energy_analyzer/energy_model.pkl"),
+    )
+    
+    def __init__(self, model_path="models/energy_model.pkl", load_model=True):
         """Initialize analyzer and load model"""
         self.model_loaded = False
         self.model = None
         self.model_path = model_path
-        
-        # Try to load model from multiple locations
-        possible_paths = [
-            model_path,
-            "models/energy_model.pkl",
-            os.path.join(os.path.dirname(__file__), "models/energy_model.pkl"),
-            os.path.expanduser("~/.energy_analyzer/energy_model.pkl"),
-        ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
+        self._proc = psutil.Process()
+        self._namespace_cache = {}
+        
+        # Pick the newest model among the candidates with one stat() each, then
+        # load only that one
+        candidates = []
+        paths = (model_path, *self.MODEL_PATHS) if load_model else ()
+        for p in paths:
+            try:
+                candidates.append((os.stat(p).st_mtime, p))
+            except OSError:
+                pass
+        if candidates:
+            mtime, path = max(candidates)
+            onnx_path = os.path.splitext(path)[0] + ".onnx"
+            forest_path = os.path.splitext(path)[0] + ".forest.npz"
+            # Exports next to the pickle skip unpickling entirely, unless they
+            # are older than the pickle they were exported from
+            for export_path, loader in ((onnx_path, _OnnxModel), (forest_path, _ForestModel)):
+                try:
+                    if os.stat(export_path).st_mtime >= mtime:
+                        self.model = loader(export_path)
+                        self.model_path = export_path
+                        break
+                except:
+                    pass
+            if self.model is None:
                 try:
                     self.model = joblib.load(path)
-                    self.model_loaded = True
                     self.model_path = path
-                    break
+                    # Batches here are tiny; a worker pool would cost more than it saves
+                    if hasattr(self.model, 'n_jobs'):
+                        self.model.n_jobs = 1
                 except:
-                    continue
+                    pass
+            self.model_loaded = self.model is not None
         
-        if not self.model_loaded:
+        if load_model and not self.model_loaded:
             print("⚠️  No trained model found. Using estimation formulas.\n")
     
     def predict_energy(self, cpu: float, memory: float, exec_time: float) -> float:
         """Predict energy cost from metrics"""
         if self.model_loaded:
-            return self.model.predict([[cpu, memory, exec_time]])[0]
+            row = np.array([[cpu, memory, exec_time]], dtype=MODEL_DTYPE)
+            return float(self.model.predict(row)[0])
         else:
-            return (cpu * 0.5) + (memory * 0.3) + (exec_time * 100 * 0.2)
+            # A single row is cheaper as plain float math than through the kernel
+            return (cpu * CPU_WEIGHT) + (memory * MEMORY_WEIGHT) + (exec_time * TIME_WEIGHT)
+    
+    def predict_energy_batch(self, X: np.ndarray) -> np.ndarray:
+        """Predict energy cost for an (n, 3) array of cpu/memory/exec_time rows"""
+        if self.model_loaded:
+            return self.model.predict(np.ascontiguousarray(X, dtype=MODEL_DTYPE))
+        # Rows are already (n, 3), so one gemv beats slicing out three column copies
+        return np.asarray(X, dtype=np.float64) @ ENERGY_COEFFS
     
     # ========== SYSTEM STATS MODE ==========
     def get_python_processes(self):
@@ -63,16 +285,19 @@ class CompleteEnergyAnalyzer:
         current_pid = os.getpid()
         processes = []
         
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'cpu_percent', 'memory_info']):
+        for proc in psutil.process_iter(['pid', 'name']):
+            # Filter on the prefetched name so cmdline is only read for Python processes
+            name = (proc.info['name'] or '').lower()
+            if not name.startswith('python') or proc.info['pid'] == current_pid:
+                continue
             try:
-                if 'python' in proc.info['name'].lower() and proc.info['pid'] != current_pid:
-                    cmdline = proc.info.get('cmdline', [])
-                    if cmdline and len(cmdline) > 1:
-                        processes.append({
-                            'pid': proc.info['pid'],
-                            'script': cmdline[1],
-                            'process': proc
-                        })
+                cmdline = proc.cmdline()
+                if cmdline and len(cmdline) > 1:
+                    processes.append({
+                        'pid': proc.info['pid'],
+                        'script': cmdline[1],
+                        'process': proc
+                    })
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 continue
         
@@ -85,8 +310,20 @@ class CompleteEnergyAnalyzer:
         print("=" * 70)
         print()
         
+        # Prime the system counter and every listed process first, so they all
+        # share one 1s sampling window instead of sleeping once for each
+        # (a blocking cpu_percent(interval) would read a cached value under oneshot)
+        python_procs = self.get_python_processes()
+        psutil.cpu_percent(None)
+        for proc_info in python_procs[:5]:
+            try:
+                proc_info['process'].cpu_percent(None)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        time.sleep(1)
+        
         # System overview
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_percent = psutil.cpu_percent(None)
         mem = psutil.virtual_memory()
         mem_used = mem.used / 1024 / 1024 / 1024
         
@@ -101,30 +338,36 @@ class CompleteEnergyAnalyzer:
         print()
         
         # Python processes
-        python_procs = self.get_python_processes()
-        
         if python_procs:
             print(f"🐍 Active Python Processes: {len(python_procs)}")
             print("-" * 70)
             
-            total_energy = 0
+            # Sample every process first, then score them all in one predict call
+            names = []
+            rows = np.empty((min(len(python_procs), 5), 3), dtype=np.float64)
             for proc_info in python_procs[:5]:
                 proc = proc_info['process']
-                script_name = os.path.basename(proc_info['script'])
-                
                 try:
-                    cpu = proc.cpu_percent(interval=0.5)
-                    mem = proc.memory_info().rss / 1024 / 1024
-                    energy = self.predict_energy(cpu, mem, 1)
-                    total_energy += energy
-                    
-                    icon = "🔥" if energy > 30 else "⚡" if energy > 15 else "✅"
-                    print(f"{icon} {script_name[:40]:40s} | "
-                          f"CPU: {cpu:5.1f}% | "
-                          f"Mem: {mem:6.1f}MB | "
-                          f"Energy: {energy:5.1f}")
+                    with proc.oneshot():
+                        cpu = proc.cpu_percent(None)
+                        mem = proc.memory_info().rss / 1024 / 1024
                 except:
                     continue
+                rows[len(names)] = (cpu, mem, 1)
+                names.append(os.path.basename(proc_info['script']))
+            
+            rows = rows[:len(names)]
+            energies = self.predict_energy_batch(rows) if names else []
+            
+            total_energy = 0
+            for script_name, (cpu, mem, _), energy in zip(names, rows, energies):
+                total_energy += energy
+                
+                icon = "🔥" if energy > 30 else "⚡" if energy > 15 else "✅"
+                print(f"{icon} {script_name[:40]:40s} | "
+                      f"CPU: {cpu:5.1f}% | "
+                      f"Mem: {mem:6.1f}MB | "
+                      f"Energy: {energy:5.1f}")
             
             if len(python_procs) > 5:
                 print(f"\n   ... and {len(python_procs) - 5} more process(es)")
@@ -185,32 +428,53 @@ class CompleteEnergyAnalyzer:
         print("-" * 70)
         
         proc = target['process']
-        measurements = []
+        # Running totals keep memory O(1) however long the session runs
+        sum_mem = max_mem = max_cpu = 0.0
+        n_mem = ticks = 0
         
         try:
-            for i in range(duration):
+            start = last_read = time.monotonic()
+            next_tick = start + 1
+            try:
+                proc.cpu_percent(None)
+                ct0 = last_ct = proc.cpu_times()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                print("⚠️  Process terminated.")
+                ct0 = last_ct = None
+            
+            while ct0 is not None and ticks < duration:
                 try:
-                    cpu = proc.cpu_percent(interval=1)
-                    mem = proc.memory_info().rss / 1024 / 1024
-                    measurements.append({'cpu': cpu, 'memory': mem})
+                    with proc.oneshot():
+                        mem = proc.memory_info().rss / 1024 / 1024
+                        now = time.monotonic()
+                        if now >= next_tick:
+                            cpu = proc.cpu_percent(None)
+                            last_ct, last_read = proc.cpu_times(), now
+                    sum_mem += mem
+                    n_mem += 1
+                    max_mem = max(max_mem, mem)
                     
-                    # Progress bar
-                    bar = "█" * (i + 1) + "░" * (duration - i - 1)
-                    print(f"\r[{bar}] {i+1}/{duration}s | "
-                          f"CPU: {cpu:6.2f}% | "
-                          f"Memory: {mem:8.2f}MB", end='', flush=True)
+                    if now >= next_tick:
+                        ticks += 1
+                        next_tick += 1
+                        max_cpu = max(max_cpu, cpu)
+                        
+                        # Progress bar
+                        bar = "█" * ticks + "░" * (duration - ticks)
+                        print(f"\r[{bar}] {ticks}/{duration}s | "
+                              f"CPU: {cpu:6.2f}% | "
+                              f"Memory: {mem:8.2f}MB", end='', flush=True)
                 except (psutil.NoSuchProcess, psutil.AccessDenied):
                     print("\n\n⚠️  Process terminated.")
                     break
+                time.sleep(SAMPLE_INTERVAL)
             
             print("\n" + "-" * 70)
             
-            if measurements:
-                # Calculate results
-                avg_cpu = sum(m['cpu'] for m in measurements) / len(measurements)
-                max_cpu = max(m['cpu'] for m in measurements)
-                avg_mem = sum(m['memory'] for m in measurements) / len(measurements)
-                max_mem = max(m['memory'] for m in measurements)
+            if ticks:
+                # Calculate results; average CPU comes from cpu_times over the whole window
+                avg_cpu = self._window_cpu(ct0, last_ct, last_read - start)
+                avg_mem = sum_mem / n_mem
                 energy = self.predict_energy(avg_cpu, avg_mem, duration)
                 
                 print("\n📊 Monitoring Results:")
@@ -232,202 +496,264 @@ class CompleteEnergyAnalyzer:
             
         except KeyboardInterrupt:
             print("\n\n⚠️  Monitoring stopped by user.")
-            if measurements:
-                avg_cpu = sum(m['cpu'] for m in measurements) / len(measurements)
-                avg_mem = sum(m['memory'] for m in measurements) / len(measurements)
-                partial_duration = len(measurements)
+            if ticks:
+                partial_duration = last_read - start
+                avg_cpu = self._window_cpu(ct0, last_ct, partial_duration)
+                avg_mem = sum_mem / n_mem
                 energy = self.predict_energy(avg_cpu, avg_mem, partial_duration)
-                print(f"\n📊 Partial Results ({partial_duration}s):")
+                print(f"\n📊 Partial Results ({partial_duration:.0f}s):")
                 print(f"   Average CPU:     {avg_cpu:.2f}%")
                 print(f"   Average Memory:  {avg_mem:.2f} MB")
                 print(f"   Energy Cost:     {energy:.2f} units")
         
         print("=" * 70)
     
+    @staticmethod
+    def _window_cpu(ct0, ct1, elapsed: float) -> float:
+        """Average CPU% between two cpu_times() readings"""
+        busy = (ct1.user + ct1.system) - (ct0.user + ct0.system)
+        return 100 * busy / max(elapsed, 1e-9)
+    
     # ========== SCRIPT ANALYSIS MODE ==========
+    def _children_usage(self) -> Optional[tuple]:
+        """CPU seconds and lifetime peak RSS (MB) of reaped child processes, or None without rusage"""
+        if resource is None:
+            return None
+        r = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return r.ru_utime + r.ru_stime, r.ru_maxrss / MAXRSS_TO_MB
+    
     def measure_script_metrics(self, script_path: str) -> Dict:
         """Execute script and measure resource usage"""
-        start_time = time.time()
-        cpu_before = psutil.cpu_percent(interval=0.1)
-        mem_before = psutil.Process().memory_info().rss / 1024 / 1024
+        # A forked child skips interpreter startup entirely; Windows can only spawn
+        ctx = mp.get_context("spawn" if os.name == "nt" else "fork")
+        out = tempfile.NamedTemporaryFile('w+', suffix='.out', delete=False)
+        err = tempfile.NamedTemporaryFile('w+', suffix='.err', delete=False)
+        out.close()
+        err.close()
         
         try:
-            result = subprocess.run(
-                ["python", script_path],
-                capture_output=True,
-                timeout=30,
-                text=True
-            )
+            before = self._children_usage()
+            # The child reports its own peak growth; RUSAGE_CHILDREN's maxrss is the
+            # largest child of this process's lifetime, not of this call
+            peak = ctx.Value('d', 0.0, lock=False) if before is not None else None
+            proc = ctx.Process(target=_run_script, args=(script_path, out.name, err.name, peak))
+            t0 = time.perf_counter()
+            proc.start()
+            
+            if before is not None:
+                proc.join(timeout=30)
+                polled_cpu, polled_peak = 0.0, 0.0
+            else:
+                polled_cpu, polled_peak = self._poll_child(proc, timeout=30)
             
-            cpu_after = psutil.cpu_percent(interval=0.1)
-            mem_after = psutil.Process().memory_info().rss / 1024 / 1024
-            exec_time = time.time() - start_time
+            t1 = time.perf_counter()
+            if proc.is_alive():
+                proc.terminate()
+                proc.join()
+                return {"error": "Script timed out (30s limit)"}
+            
+            exec_time = t1 - t0
+            if before is not None:
+                cpu_time = self._children_usage()[0] - before[0]
+                memory = peak.value
+            else:
+                cpu_time, memory = polled_cpu, polled_peak
+            
+            with open(out.name) as f:
+                stdout = f.read()
+            with open(err.name) as f:
+                stderr = f.read()
             
             return {
-                "cpu_usage": max(cpu_after, cpu_before),
-                "memory_usage": max(mem_after - mem_before, 0),
+                "cpu_usage": 100 * cpu_time / max(exec_time, 1e-9),
+                "memory_usage": memory,
                 "exec_time": exec_time,
-                "success": result.returncode == 0,
-                "stdout": result.stdout,
-                "stderr": result.stderr
+                "success": proc.exitcode == 0,
+                "stdout": stdout,
+                "stderr": stderr
             }
-        except subprocess.TimeoutExpired:
-            return {"error": "Script timed out (30s limit)"}
         except Exception as e:
             return {"error": f"Execution failed: {str(e)}"}
+        finally:
+            for path in (out.name, err.name):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+    
+    @staticmethod
+    def _poll_child(proc, timeout: float) -> tuple:
+        """CPU seconds and peak RSS (MB) of a running child, sampled with psutil"""
+        deadline = time.perf_counter() + timeout
+        cpu_time, peak = 0.0, 0.0
+        try:
+            child = psutil.Process(proc.pid)
+            while proc.is_alive() and time.perf_counter() < deadline:
+                with child.oneshot():
+                    ct = child.cpu_times()
+                    rss = child.memory_info().rss
+                cpu_time = ct.user + ct.system
+                peak = max(peak, rss / (1024 * 1024))
+                time.sleep(0.01)
+        except psutil.Error:
+            pass
+        proc.join(timeout=max(deadline - time.perf_counter(), 0))
+        return cpu_time, peak
+    
+    def _script_namespace(self, script_path: str) -> Dict:
+        """Run a script's top-level code once and cache the resulting namespace"""
+        key = (script_path, os.path.getmtime(script_path))
+        namespace = self._namespace_cache.get(key)
+        if namespace is None:
+            namespace = {
+                '__name__': os.path.splitext(os.path.basename(script_path))[0],
+                '__file__': script_path
+            }
+            try:
+                code = _cached_code(*key)
+                with _time_limit(FUNCTION_TIMEOUT), redirect_stdout(io.StringIO()):
+                    exec(code, namespace)
+            except:
+                # A module that fails to import has no functions to probe
+                namespace = {}
+            self._namespace_cache[key] = namespace
+        return namespace
     
     def extract_functions(self, script_path: str) -> List[str]:
         """Extract function names from script"""
         try:
-            with open(script_path, 'r') as f:
-                tree = ast.parse(f.read())
-            return [node.name for node in ast.walk(tree) if isinstance(node, ast.FunctionDef)]
+            _, _, funcs = _load_ast(script_path, os.path.getmtime(script_path))
+            return list(funcs)
         except:
             return []
     
-    def analyze_function(self, script_path: str, func_name: str) -> Optional[Dict]:
+    def analyze_function(self, script_path: str, func_name: str) -> Optional[FunctionResult]:
         """Analyze individual function"""
         try:
-            with open(script_path, 'r') as f:
-                code = f.read()
-            
-            namespace = {}
-            exec(code, namespace)
+            _, _, funcs = _load_ast(script_path, os.path.getmtime(script_path))
+            namespace = self._script_namespace(script_path)
             
             if func_name not in namespace:
                 return None
             
             func = namespace[func_name]
             
-            start_time = time.time()
-            cpu_before = psutil.cpu_percent(interval=0.1)
-            mem_before = psutil.Process().memory_info().rss / 1024 / 1024
+            mem_before = self._proc.memory_info().rss / 1024 / 1024
+            # This process's own CPU time: no sampling sleeps, and other processes don't leak in
+            cpu_t0 = time.process_time_ns()
+            t0 = time.perf_counter_ns()
             
             try:
-                func()
+                with _time_limit(FUNCTION_TIMEOUT):
+                    func()
             except TypeError:
-                return self.estimate_function_ast(code, func_name)
+                return self.estimate_function_ast(funcs[func_name])
             except:
                 return None
             
-            cpu_after = psutil.cpu_percent(interval=0.1)
-            mem_after = psutil.Process().memory_info().rss / 1024 / 1024
-            exec_time = time.time() - start_time
+            wall_ns = max(time.perf_counter_ns() - t0, 1)
+            cpu_ns = time.process_time_ns() - cpu_t0
+            mem_after = self._proc.memory_info().rss / 1024 / 1024
+            exec_time = wall_ns / 1e9
             
-            cpu_usage = max(cpu_after - cpu_before, 0)
+            cpu_usage = 100.0 * cpu_ns / wall_ns
             memory_usage = max(mem_after - mem_before, 0)
-            energy = self.predict_energy(cpu_usage, memory_usage, exec_time)
             
-            return {
-                "function": func_name,
-                "cpu_usage": cpu_usage,
-                "memory_usage": memory_usage,
-                "exec_time": exec_time,
-                "energy": energy,
-                "estimated": False
-            }
+            # Energy is filled in by analyze_script in one batch
+            return FunctionResult(func_name, cpu_usage, memory_usage, exec_time, 0.0, False)
         except:
             return None
     
-    def estimate_function_ast(self, code: str, func_name: str) -> Optional[Dict]:
-        """Estimate function metrics from static analysis"""
-        try:
-            tree = ast.parse(code)
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef) and node.name == func_name:
-                    loops = sum(1 for n in ast.walk(node) if isinstance(n, (ast.For, ast.While)))
-                    recursion = sum(1 for n in ast.walk(node) 
-                                  if isinstance(n, ast.Call) and hasattr(n.func, 'id') 
-                                  and n.func.id == func_name)
-                    lines = len(node.body)
-                    
-                    cpu_est = loops * 5 + recursion * 10 + lines * 0.5
-                    mem_est = lines * 0.2
-                    time_est = (loops * 0.1 + recursion * 0.5) / 10
-                    
-                    energy = self.predict_energy(cpu_est, mem_est, time_est)
-                    
-                    return {
-                        "function": func_name,
-                        "cpu_usage": cpu_est,
-                        "memory_usage": mem_est,
-                        "exec_time": time_est,
-                        "energy": energy,
-                        "estimated": True
-                    }
-        except:
-            pass
-        return None
+    def estimate_function_ast(self, func_node: ast.FunctionDef) -> FunctionResult:
+        """Estimate function metrics from static analysis of its cached AST node"""
+        loops, recursion = _complexity_counts(func_node)
+        lines = len(func_node.body)
+        
+        cpu_est = loops * 5 + recursion * 10 + lines * 0.5
+        mem_est = lines * 0.2
+        time_est = (loops * 0.1 + recursion * 0.5) / 10
+        
+        return FunctionResult(func_node.name, cpu_est, mem_est, time_est, 0.0, True)
     
     def print_script_report(self, script_path: str, metrics: Dict, energy: float):
         """Print script-level analysis report"""
-        print("=" * 70)
-        print("🔋 ENERGY EFFICIENCY REPORT")
-        print("=" * 70)
-        print(f"\n📄 Script: {os.path.basename(script_path)}")
-        print(f"📍 Path: {os.path.abspath(script_path)}\n")
-        
-        print("📊 Metrics:")
-        print(f"   CPU usage:      {metrics['cpu_usage']:>8.2f}%")
-        print(f"   Memory usage:   {metrics['memory_usage']:>8.2f} MB")
-        print(f"   Execution time: {metrics['exec_time']:>8.4f}s\n")
-        
-        print(f"⚡ Predicted Energy Cost: {energy:.2f} units")
-        print(f"💵 Estimated Cost: ${energy * 0.01:.4f}\n")
+        # Built up and written once rather than one print() per line
+        out = []
+        out.append("=" * 70)
+        out.append("🔋 ENERGY EFFICIENCY REPORT")
+        out.append("=" * 70)
+        out.append(f"\n📄 Script: {os.path.basename(script_path)}")
+        out.append(f"📍 Path: {os.path.abspath(script_path)}\n")
+        
+        out.append("📊 Metrics:")
+        out.append(f"   CPU usage:      {metrics['cpu_usage']:>8.2f}%")
+        out.append(f"   Memory usage:   {metrics['memory_usage']:>8.2f} MB")
+        out.append(f"   Execution time: {metrics['exec_time']:>8.4f}s\n")
+        
+        out.append(f"⚡ Predicted Energy Cost: {energy:.2f} units")
+        out.append(f"💵 Estimated Cost: ${energy * 0.01:.4f}\n")
         
         if energy < 20:
-            print("✅ Rating: EXCELLENT - Very efficient code")
+            out.append("✅ Rating: EXCELLENT - Very efficient code")
         elif energy < 40:
-            print("✔️  Rating: GOOD - Moderately efficient")
+            out.append("✔️  Rating: GOOD - Moderately efficient")
         elif energy < 60:
-            print("⚠️  Rating: FAIR - Room for optimization")
+            out.append("⚠️  Rating: FAIR - Room for optimization")
         else:
-            print("🚨 Rating: POOR - High power consumption")
+            out.append("🚨 Rating: POOR - High power consumption")
         
-        print("=" * 70)
+        out.append("=" * 70)
+        sys.stdout.write("\n".join(out) + "\n")
     
-    def print_function_report(self, results: List[Dict]):
+    def print_function_report(self, results: List[FunctionResult]):
         """Print function-level analysis report"""
         if not results:
             print("\n⚠️  No functions found or analyzed.")
             return
         
-        print("\n" + "=" * 70)
-        print("🔍 FUNCTION-LEVEL ANALYSIS")
-        print("=" * 70 + "\n")
+        out = []
+        out.append("\n" + "=" * 70)
+        out.append("🔍 FUNCTION-LEVEL ANALYSIS")
+        out.append("=" * 70 + "\n")
         
-        sorted_results = sorted(results, key=lambda x: x['energy'], reverse=True)
-        total_energy = sum(r['energy'] for r in sorted_results)
+        energies = np.fromiter(map(attrgetter('energy'), results), dtype=np.float64, count=len(results))
+        total_energy = float(energies.sum())
+        # Stable descending order, same tie-breaking as sorted(..., reverse=True)
+        sorted_results = [results[i] for i in np.argsort(-energies, kind='stable').tolist()]
         
-        print("Function Summary:")
-        print("-" * 70)
+        out.append("Function Summary:")
+        out.append("-" * 70)
         
+        high_energy = []
+        emit = out.append
         for r in sorted_results:
-            icon = "🚨" if r['energy'] > 50 else "⚠️ " if r['energy'] > 20 else "✅"
-            tag = " [estimated]" if r.get('estimated', False) else ""
+            energy = r.energy
+            if energy > 50:
+                high_energy.append(r)
+            icon = "🚨" if energy > 50 else "⚠️ " if energy > 20 else "✅"
+            tag = " [estimated]" if r.estimated else ""
             
-            print(f"\n{r['function']}() → {r['energy']:.2f} units {icon}{tag}")
-            print(f"   CPU: {r['cpu_usage']:.2f}% | "
-                  f"Memory: {r['memory_usage']:.2f}MB | "
-                  f"Time: {r['exec_time']:.4f}s")
+            emit("\n%s() → %.2f units %s%s" % (r.function, energy, icon, tag))
+            emit("   CPU: %.2f%% | Memory: %.2fMB | Time: %.4fs"
+                 % (r.cpu_usage, r.memory_usage, r.exec_time))
         
-        print("\n" + "-" * 70)
-        print(f"💰 Total Function Energy: {total_energy:.2f} units")
-        print(f"💵 Total Cost: ${total_energy * 0.01:.4f}")
+        out.append("\n" + "-" * 70)
+        out.append(f"💰 Total Function Energy: {total_energy:.2f} units")
+        out.append(f"💵 Total Cost: ${total_energy * 0.01:.4f}")
         
-        high_energy = [r for r in sorted_results if r['energy'] > 50]
         if high_energy:
-            print("\n🔧 OPTIMIZATION SUGGESTIONS:")
+            out.append("\n🔧 OPTIMIZATION SUGGESTIONS:")
             for func in high_energy:
-                print(f"\n   🎯 {func['function']}():")
-                print(f"      • Reduce computational complexity")
-                print(f"      • Use built-in functions and libraries")
-                print(f"      • Consider caching or memoization")
-                print(f"      • Optimize loops and data structures")
+                out.append(f"\n   🎯 {func.function}():")
+                out.append(f"      • Reduce computational complexity")
+                out.append(f"      • Use built-in functions and libraries")
+                out.append(f"      • Consider caching or memoization")
+                out.append(f"      • Optimize loops and data structures")
         else:
-            print("\n✨ All functions are energy-efficient!")
+            out.append("\n✨ All functions are energy-efficient!")
         
-        print("=" * 70)
+        out.append("=" * 70)
+        sys.stdout.write("\n".join(out) + "\n")
     
     def analyze_script(self, script_path: str, analyze_functions: bool = False, detailed: bool = False):
         """Analyze a specific script"""
@@ -442,11 +768,45 @@ class CompleteEnergyAnalyzer:
             print(f"❌ {metrics['error']}")
             return
         
-        energy = self.predict_energy(
-            metrics['cpu_usage'],
-            metrics['memory_usage'],
-            metrics['exec_time']
-        )
+        results = []
+        functions = []
+        if analyze_functions:
+            print("⏳ Analyzing individual functions...\n")
+            functions = self.extract_functions(script_path)
+            # One slot per function keeps results in source order for the batch write-back
+            slots = [None] * len(functions)
+            if len(functions) > 1:
+                # Warm the on-disk code cache first, so the workers all load it
+                # instead of each compiling the same script on a first run
+                try:
+                    _cached_code(script_path, os.path.getmtime(script_path))
+                except Exception:
+                    pass
+                # Functions are independent, so overlap their probes across cores;
+                # each worker execs the script once in its initializer
+                with ProcessPoolExecutor(max_workers=min(len(functions), os.cpu_count() or 1),
+                                         initializer=_init_function_worker,
+                                         initargs=(script_path,)) as executor:
+                    futures = {
+                        executor.submit(_analyze_function_task, script_path, func_name): idx
+                        for idx, func_name in enumerate(functions)
+                    }
+                    for future in as_completed(futures):
+                        slots[futures[future]] = future.result()
+            else:
+                for idx, func_name in enumerate(functions):
+                    slots[idx] = self.analyze_function(script_path, func_name)
+            results = [r for r in slots if r]
+        
+        # Deferred predictions: one model call for the script and every function.
+        # Records are packed back to back, so the batch is a zero-copy (n, 3) view
+        rows = np.empty(len(results) + 1, dtype=METRIC_RECORD)
+        rows[0] = (metrics['cpu_usage'], metrics['memory_usage'], metrics['exec_time'])
+        for idx, r in enumerate(results, 1):
+            rows[idx] = (r.cpu_usage, r.memory_usage, r.exec_time)
+        energies = self.predict_energy_batch(rows.view(np.float64).reshape(-1, 3)).tolist()
+        energy = energies[0]
+        results = [r._replace(energy=func_energy) for r, func_energy in zip(results, energies[1:])]
         
         self.print_script_report(script_path, metrics, energy)
         
@@ -460,16 +820,8 @@ class CompleteEnergyAnalyzer:
                 print(metrics["stderr"][:500])
         
         if analyze_functions:
-            print("\n⏳ Analyzing individual functions...\n")
-            functions = self.extract_functions(script_path)
-            
+            print()
             if functions:
-                results = []
-                for func_name in functions:
-                    result = self.analyze_function(script_path, func_name)
-                    if result:
-                        results.append(result)
-                
                 self.print_function_report(results)
             else:
                 print("⚠️  No functions found in script.")
@@ -0,0 +1,22 @@
+"""
+AST helpers shared by the collector's function worker and the analyzer
+
+Standard library only, so the worker subprocess can import it without paying
+for NumPy at startup.
+"""
+
+import ast
+
+
+def strip_toplevel_calls(tree: ast.Module) -> ast.Module:
+    """Copy of a module without bare top-level calls to its own functions, so exec only defines things"""
+    # Calls like random.seed(0) or sys.setrecursionlimit(...) are setup the
+    # functions depend on, so only `name()` calls of module-level defs are the demo run
+    defined = {node.name for node in tree.body
+               if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    body = [node for node in tree.body
+            if not (isinstance(node, ast.Expr)
+                    and isinstance(node.value, ast.Call)
+                    and isinstance(node.value.func, ast.Name)
+                    and node.value.func.id in defined)]
+    return ast.Module(body=body, type_ignores=tree.type_ignores)
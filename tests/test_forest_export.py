@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+ensemble = pytest.importorskip("sklearn.ensemble")
+
+from energy_kernels import predict_forest
+from train_model import EnergyModelTrainer
+
+
+@pytest.fixture(scope="module")
+def fitted(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    # Half-integer features make every midpoint threshold exact in float32, so
+    # rows placed on a threshold really hit the `<=` boundary
+    X = rng.integers(0, 200, size=(400, 3)) / 2.0
+    y = X @ np.array([0.5, 0.3, 20.0]) + rng.normal(0, 1, size=400)
+    
+    trainer = EnergyModelTrainer(model_type="random_forest")
+    trainer.X_train, trainer.y_train = X, y
+    trainer.model = ensemble.RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0)
+    trainer.model.fit(X, y)
+    
+    path = tmp_path_factory.mktemp("forest") / "energy_forest.npz"
+    assert trainer.export_forest(path)
+    with np.load(path) as data:
+        forest = dict(data)
+    return trainer.model, forest, X
+
+
+def float_forest(forest):
+    """The same forest with float thresholds looked back up from the int16 bins"""
+    forest = dict(forest)
+    edges, edge_offsets = forest.pop("edges"), forest.pop("edge_offsets")
+    feature, qthreshold = forest["feature"], forest.pop("qthreshold")
+    splits = feature >= 0
+    threshold = np.zeros(len(feature))
+    threshold[splits] = edges[edge_offsets[feature[splits]] + qthreshold[splits]]
+    forest["threshold"] = threshold
+    return forest
+
+
+def on_threshold_rows(forest):
+    """Rows whose values sit exactly on each feature's split thresholds"""
+    edges, edge_offsets = forest["edges"], forest["edge_offsets"]
+    n_features = len(edge_offsets) - 1
+    rows = []
+    for f in range(n_features):
+        thresholds = edges[edge_offsets[f]:edge_offsets[f + 1]]
+        row = np.full((len(thresholds), n_features), 50.0)
+        row[:, f] = thresholds
+        rows.append(row)
+    return np.vstack(rows)
+
+
+def test_export_is_quantized(fitted):
+    _, forest, _ = fitted
+    assert forest["qthreshold"].dtype == np.int16
+    assert "threshold" not in forest
+    assert np.array_equal(forest["edges"].astype(np.float32), forest["edges"])
+
+
+@pytest.mark.parametrize("quantized", [True, False])
+def test_predict_forest_matches_sklearn(fitted, quantized):
+    model, forest, X = fitted
+    rng = np.random.default_rng(1)
+    X_eval = np.vstack([X, rng.uniform(-10, 110, size=(200, 3)), on_threshold_rows(forest)])
+    # Both paths compare float32-rounded inputs, as sklearn does
+    X_eval = np.vstack([X_eval, X_eval.astype(np.float32).astype(np.float64)])
+    
+    if not quantized:
+        forest = float_forest(forest)
+    
+    np.testing.assert_allclose(predict_forest(X_eval, forest), model.predict(X_eval), rtol=1e-12)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+metrics = pytest.importorskip("sklearn.metrics")
+
+from train_model import _regression_metrics
+
+
+def assert_matches_sklearn(y_true, y_pred):
+    r2, mae, rmse = _regression_metrics(y_true, y_pred)
+    assert r2 == pytest.approx(metrics.r2_score(y_true, y_pred))
+    assert mae == pytest.approx(metrics.mean_absolute_error(y_true, y_pred))
+    assert rmse == pytest.approx(np.sqrt(metrics.mean_squared_error(y_true, y_pred)))
+
+
+def test_matches_sklearn_on_random_data():
+    rng = np.random.default_rng(0)
+    y_true = rng.normal(50, 10, size=500)
+    y_pred = y_true + rng.normal(0, 3, size=500)
+    assert_matches_sklearn(y_true, y_pred)
+
+
+def test_matches_sklearn_on_float32_predictions():
+    y_true = np.array([1.5, 2.0, 3.25, 10.0])
+    y_pred = np.array([1.0, 2.5, 3.0, 9.0], dtype=np.float32)
+    assert_matches_sklearn(y_true, y_pred)
+
+
+def test_constant_target_perfect_prediction():
+    y_true = np.full(10, 7.0)
+    assert_matches_sklearn(y_true, y_true.copy())
+    assert _regression_metrics(y_true, y_true)[0] == 1.0
+
+
+def test_constant_target_imperfect_prediction():
+    y_true = np.full(10, 7.0)
+    y_pred = y_true + np.linspace(-1, 1, 10)
+    assert_matches_sklearn(y_true, y_pred)
+    assert _regression_metrics(y_true, y_pred)[0] == 0.0
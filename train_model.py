@@ -1,23 +1,123 @@
-import pandas as pd
+import argparse
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
 import joblib
+from joblib import Parallel, delayed
+import io
 import os
 import sys
+from contextlib import redirect_stdout
+from operator import itemgetter
+
+# pandas, pyarrow and sklearn are imported where they are used, so --help and
+# argument errors don't pay for their import chains
+
+MODEL_TYPES = ["random_forest", "gradient_boosting", "hist_gbr", "linear"]
+
+FEATURES = ["cpu_usage", "memory_usage", "exec_time"]
+TARGET = "energy_cost"
+COLUMN_DTYPES = {**{f: "float32" for f in FEATURES}, TARGET: "float64"}
+
+# Streaming mode: rows read per chunk and trees added per chunk (warm_start); the
+# final model is topped up to at least STREAM_MIN_TREES, the non-streamed size
+STREAM_CHUNKSIZE = 50_000
+TREES_PER_CHUNK = 20
+STREAM_MIN_TREES = 100
+# Rows held out for testing in streaming mode; later chunks are trained on in full
+STREAM_TEST_MAX_SAMPLES = 5000
+STREAM_MODEL_TYPES = ["random_forest", "gradient_boosting"]
+
+# Full-width importance bar, sliced per feature
+BAR = "█" * 50
+
+# Cross-validation is skipped below CV_MIN_SAMPLES rows and runs on a random
+# subsample beyond CV_MAX_SAMPLES
+CV_MIN_SAMPLES = 100
+CV_MAX_SAMPLES = 5000
+
+# Parsed data and splits are reused across runs until the CSV changes; joblib.Memory
+# hashes arguments rather than file contents, so the mtime is part of every key.
+# collect_data.py rewrites the CSVs on every run, so the cache is trimmed back to
+# CACHE_BYTES_LIMIT (least recently used entries first) after each load
+_memory = joblib.Memory(".cache", mmap_mode='r', compress=False, verbose=0)
+CACHE_BYTES_LIMIT = "256M"
+
+def _trim_cache():
+    """Evict stale frames and splits left behind by earlier versions of the CSVs"""
+    try:
+        _memory.reduce_size(bytes_limit=CACHE_BYTES_LIMIT)
+    except Exception:
+        # A failed cleanup only costs disk space
+        pass
+
+@_memory.cache
+def _load_frame(path, mtime):
+    """Read the feature/target columns of a metrics CSV"""
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pv
+    except ImportError:
+        pv = None
+    
+    # Only the feature/target columns are parsed, straight into their final dtypes
+    if pv is not None:
+        # Multithreaded parse directly into Arrow columns
+        table = pv.read_csv(
+            path,
+            convert_options=pv.ConvertOptions(
+                include_columns=[*FEATURES, TARGET],
+                column_types={c: pa.type_for_alias(t) for c, t in COLUMN_DTYPES.items()}
+            )
+        )
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    
+    import pandas as pd
+    return pd.read_csv(
+        path,
+        usecols=[*FEATURES, TARGET],
+        dtype=COLUMN_DTYPES,
+        engine="c",
+        memory_map=True
+    )
+
+@_memory.cache
+def _split_features(path, mtime, seed=42):
+    """Feature matrix, target and the train/test split for a metrics CSV"""
+    data = _load_frame(path, mtime)
+    # sklearn trees work on float32 X and float64 y; matching that avoids a copy per fit/predict
+    X = np.ascontiguousarray(data[FEATURES].to_numpy(dtype=np.float32))
+    y = np.ascontiguousarray(data[TARGET].to_numpy(dtype=np.float64))
+    # Shuffled 80/20 split by permutation; same test-size rounding as train_test_split
+    perm = np.random.default_rng(seed).permutation(len(X))
+    n_train = len(X) - int(np.ceil(0.2 * len(X)))
+    train_idx, test_idx = perm[:n_train], perm[n_train:]
+    X_train, X_test = np.ascontiguousarray(X[train_idx]), np.ascontiguousarray(X[test_idx])
+    y_train, y_test = y[train_idx], y[test_idx]
+    return X, y, X_train, X_test, y_train, y_test
+
+def _regression_metrics(y_true, y_pred):
+    """R², MAE and RMSE from one residual array"""
+    y_true = np.asarray(y_true, dtype=np.float64)
+    residuals = y_true - np.asarray(y_pred, dtype=np.float64)
+    ss_res = residuals @ residuals
+    centered = y_true - y_true.mean()
+    ss_tot = centered @ centered
+    # Same convention as sklearn's r2_score for a constant target
+    r2 = 1 - ss_res / ss_tot if ss_tot else (1.0 if not ss_res else 0.0)
+    return r2, np.abs(residuals).mean(), np.sqrt(ss_res / len(residuals))
 
 class EnergyModelTrainer:
-    def __init__(self, data_path="data/function_metrics.csv", model_type="random_forest"):
+    def __init__(self, data_path="data/function_metrics.csv", model_type="random_forest",
+                 verbose_train_metrics=False):
         self.data_path = data_path
         self.model_type = model_type
+        self.verbose_train_metrics = verbose_train_metrics
         self.model = None
         self.data = None
         self.X_train = None
         self.X_test = None
         self.y_train = None
         self.y_test = None
+        self.streamed = False
     
     def load_data(self):
         """Load training data"""
@@ -28,7 +128,8 @@ class EnergyModelTrainer:
             print("   Run 'python collect_data.py' first to generate training data.\n")
             return False
         
-        self.data = pd.read_csv(self.data_path)
+        self.data = _load_frame(self.data_path, os.path.getmtime(self.data_path))
+        _trim_cache()
         print(f"✅ Loaded {len(self.data)} samples\n")
         
         if len(self.data) < 10:
@@ -37,7 +138,12 @@ class EnergyModelTrainer:
         # Display summary
         print("📊 Dataset Summary:")
         print("-" * 60)
-        print(self.data.describe().round(2))
+        # min/mean/max in one NumPy pass instead of describe()'s eight per-column stats
+        import pandas as pd
+        columns = [*FEATURES, TARGET]
+        arr = self.data[columns].to_numpy(dtype=np.float64)
+        stats = np.stack([arr.min(axis=0), arr.mean(axis=0), arr.max(axis=0)])
+        print(pd.DataFrame(stats, index=["min", "mean", "max"], columns=columns).round(2))
         print()
         
         return True
@@ -48,39 +154,63 @@ class EnergyModelTrainer:
         
         # Features: cpu_usage, memory_usage, exec_time
         # Target: energy_cost
-        self.X = self.data[["cpu_usage", "memory_usage", "exec_time"]].values
-        self.y = self.data["energy_cost"].values
+        (self.X, self.y, self.X_train, self.X_test,
+         self.y_train, self.y_test) = _split_features(self.data_path, os.path.getmtime(self.data_path))
+        _trim_cache()
         
-        # Train-test split
-        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
-            self.X, self.y, test_size=0.2, random_state=42
-        )
+        # One explicit check here lets sklearn skip its own on every fit/predict
+        if not (np.isfinite(self.X).all() and np.isfinite(self.y).all()):
+            print("❌ Error: training data contains NaN or infinite values")
+            print("   Re-run 'python collect_data.py' or clean the CSV.\n")
+            return False
         
         print(f"   Training samples: {len(self.X_train)}")
         print(f"   Testing samples:  {len(self.X_test)}\n")
+        return True
     
-    def train_model(self):
-        """Train the selected model"""
-        print(f"🤖 Training {self.model_type.replace('_', ' ').title()} model...")
+    def _build_model(self, n_jobs=-1):
+        """Unfitted estimator for self.model_type, or None if the type is unknown"""
+        from sklearn.ensemble import (GradientBoostingRegressor, HistGradientBoostingRegressor,
+                                      RandomForestRegressor)
+        from sklearn.linear_model import LinearRegression
         
         if self.model_type == "random_forest":
-            self.model = RandomForestRegressor(
+            return RandomForestRegressor(
                 n_estimators=100,
                 max_depth=10,
+                # Each tree fits a 70% bootstrap sample: less work per tree, similar accuracy
+                max_samples=0.7,
+                bootstrap=True,
                 random_state=42,
-                n_jobs=-1
+                n_jobs=n_jobs
             )
         elif self.model_type == "gradient_boosting":
-            self.model = GradientBoostingRegressor(
+            return GradientBoostingRegressor(
                 n_estimators=100,
                 max_depth=5,
                 random_state=42
             )
+        elif self.model_type == "hist_gbr":
+            # Bins each feature into histograms once, so fitting is far cheaper than exact splits
+            return HistGradientBoostingRegressor(
+                max_iter=200,
+                max_depth=8,
+                learning_rate=0.05,
+                early_stopping=True,
+                random_state=42
+            )
         elif self.model_type == "linear":
-            self.model = LinearRegression()
-        else:
+            return LinearRegression()
+        return None
+    
+    def train_model(self, n_jobs=-1):
+        """Train the selected model"""
+        print(f"🤖 Training {self.model_type.replace('_', ' ').title()} model...")
+        
+        self.model = self._build_model(n_jobs=n_jobs)
+        if self.model is None:
             print(f"❌ Unknown model type: {self.model_type}")
-            print("   Available: random_forest, gradient_boosting, linear")
+            print(f"   Available: {', '.join(MODEL_TYPES)}")
             return False
         
         # Train
@@ -89,37 +219,196 @@ class EnergyModelTrainer:
         
         return True
     
+    def train_streaming(self, chunksize=STREAM_CHUNKSIZE):
+        """Fit chunk by chunk with warm_start, holding out ~20% of each chunk for testing"""
+        import pandas as pd
+        
+        print(f"📂 Streaming data from: {self.data_path} ({chunksize} rows per chunk)")
+        
+        if not os.path.exists(self.data_path):
+            print(f"\n❌ Error: {self.data_path} not found!")
+            print("   Run 'python collect_data.py' first to generate training data.\n")
+            return False
+        if self.model_type not in STREAM_MODEL_TYPES:
+            print(f"❌ Streaming supports {', '.join(STREAM_MODEL_TYPES)}, not {self.model_type}\n")
+            return False
+        
+        print(f"🤖 Training {self.model_type.replace('_', ' ').title()} model incrementally...")
+        # Every chunk adds trees on top of the ones already fitted
+        self.model = self._build_model()
+        self.model.set_params(warm_start=True, n_estimators=0)
+        
+        rng = np.random.default_rng(42)
+        columns = [*FEATURES, TARGET]
+        # Chan/Welford running moments, plus min/max, for the summary table
+        count = 0
+        mean = np.zeros(len(columns))
+        m2 = np.zeros(len(columns))
+        lo = np.full(len(columns), np.inf)
+        hi = np.full(len(columns), -np.inf)
+        test_X, test_y, n_test = [], [], 0
+        
+        chunks = pd.read_csv(self.data_path, usecols=columns, dtype=COLUMN_DTYPES,
+                             engine="c", chunksize=chunksize)
+        for idx, chunk in enumerate(chunks, 1):
+            X = np.ascontiguousarray(chunk[FEATURES].to_numpy(dtype=np.float32))
+            y = chunk[TARGET].to_numpy(dtype=np.float64)
+            if not (np.isfinite(X).all() and np.isfinite(y).all()):
+                print(f"❌ Error: chunk {idx} contains NaN or infinite values\n")
+                return False
+            
+            arr = chunk[columns].to_numpy(dtype=np.float64)
+            n_b = len(arr)
+            mean_b = arr.mean(axis=0)
+            delta = mean_b - mean
+            total = count + n_b
+            mean += delta * n_b / total
+            m2 += ((arr - mean_b) ** 2).sum(axis=0) + delta ** 2 * count * n_b / total
+            count = total
+            lo = np.minimum(lo, arr.min(axis=0))
+            hi = np.maximum(hi, arr.max(axis=0))
+            
+            # ~20% of rows are held out until the cap is reached, so memory stays
+            # bounded by the chunk size; past it every row is trained on
+            is_test = np.zeros(n_b, dtype=bool)
+            remaining = STREAM_TEST_MAX_SAMPLES - n_test
+            if remaining > 0:
+                is_test = rng.random(n_b) < 0.2
+                is_test[np.flatnonzero(is_test)[remaining:]] = False
+                if is_test.all():
+                    is_test[:] = False
+                test_X.append(X[is_test])
+                test_y.append(y[is_test])
+                n_test += int(is_test.sum())
+            
+            self.X_train, self.y_train = np.ascontiguousarray(X[~is_test]), y[~is_test]
+            self.model.n_estimators += TREES_PER_CHUNK
+            self.model.fit(self.X_train, self.y_train)
+            print(f"   Chunk {idx}: {n_b} rows → {self.model.n_estimators} trees")
+        
+        if not count or not n_test:
+            print("❌ Error: not enough rows to train and test on\n")
+            return False
+        
+        # Small CSVs fit in one or two chunks; don't ship a smaller model than usual
+        if self.model.n_estimators < STREAM_MIN_TREES:
+            self.model.n_estimators = STREAM_MIN_TREES
+            self.model.fit(self.X_train, self.y_train)
+            print(f"   Topped up on the last chunk → {self.model.n_estimators} trees")
+        
+        self.X_test = np.concatenate(test_X)
+        self.y_test = np.concatenate(test_y)
+        self.streamed = True
+        print(f"✅ Training complete on {count} samples ({n_test} held out)\n")
+        
+        print("📊 Dataset Summary:")
+        print("-" * 60)
+        stats = np.stack([lo, mean, np.sqrt(m2 / count), hi])
+        print(pd.DataFrame(stats, index=["min", "mean", "std", "max"], columns=columns).round(2))
+        print()
+        
+        return True
+    
+    def _fit_eval(self, model_type):
+        """Train one candidate model and score it on the test split (comparison worker)"""
+        from sklearn import set_config
+        
+        # Workers don't inherit the parent's sklearn config; the data was already checked
+        set_config(assume_finite=True)
+        self.model_type = model_type
+        # Candidates already run side by side, so each forest stays single-threaded
+        with redirect_stdout(io.StringIO()):
+            self.train_model(n_jobs=1)
+        y_pred = self.model.predict(self.X_test)
+        r2, mae, rmse = _regression_metrics(self.y_test, y_pred)
+        return {
+            "model_type": model_type,
+            "model": self.model,
+            "r2": r2,
+            "mae": mae,
+            "rmse": rmse
+        }
+    
+    def compare_models(self):
+        """Train every model type in parallel and keep the best by test R²"""
+        print(f"🤖 Comparing {len(MODEL_TYPES)} model types...")
+        
+        results = Parallel(n_jobs=len(MODEL_TYPES), backend='loky')(
+            delayed(self._fit_eval)(model_type) for model_type in MODEL_TYPES
+        )
+        
+        print()
+        print(f"   {'Model':20s} {'R²':>8s} {'MAE':>10s} {'RMSE':>10s}")
+        for r in sorted(results, key=itemgetter("r2"), reverse=True):
+            print(f"   {r['model_type']:20s} {r['r2']:8.4f} {r['mae']:10.4f} {r['rmse']:10.4f}")
+        
+        best = max(results, key=itemgetter("r2"))
+        self.model_type = best["model_type"]
+        self.model = best["model"]
+        # The winner is what gets saved and served, so let it use every core again
+        if 'n_jobs' in self.model.get_params():
+            self.model.set_params(n_jobs=-1)
+        print(f"\n✅ Best model: {self.model_type.replace('_', ' ').title()}\n")
+        
+        return True
+    
     def evaluate_model(self):
         """Evaluate model performance"""
+        from sklearn.base import clone
+        from sklearn.linear_model import LinearRegression
+        from sklearn.model_selection import KFold, cross_val_score
+        
         print("=" * 60)
         print("📈 MODEL EVALUATION")
         print("=" * 60)
         print()
         
-        # Training predictions
-        y_train_pred = self.model.predict(self.X_train)
-        train_r2 = r2_score(self.y_train, y_train_pred)
-        train_mae = mean_absolute_error(self.y_train, y_train_pred)
-        
-        # Testing predictions
-        y_test_pred = self.model.predict(self.X_test)
-        test_r2 = r2_score(self.y_test, y_test_pred)
-        test_mae = mean_absolute_error(self.y_test, y_test_pred)
-        test_rmse = np.sqrt(mean_squared_error(self.y_test, y_test_pred))
+        # Testing predictions; with training metrics on, one predict call covers both splits
+        if self.verbose_train_metrics and not isinstance(self.model, LinearRegression):
+            n_train = len(self.X_train)
+            y_all_pred = self.model.predict(np.vstack([self.X_train, self.X_test]))
+            y_train_pred, y_test_pred = y_all_pred[:n_train], y_all_pred[n_train:]
+        else:
+            y_test_pred = self.model.predict(self.X_test)
+            if self.verbose_train_metrics:
+                y_train_pred = self.X_train @ self.model.coef_ + self.model.intercept_
+        test_r2, test_mae, test_rmse = _regression_metrics(self.y_test, y_test_pred)
         
-        print("Training Metrics:")
-        print(f"   R² Score:            {train_r2:.4f}")
-        print(f"   Mean Absolute Error: {train_mae:.4f}\n")
+        # Training-set fit is only a diagnostic; skip it unless asked
+        if self.verbose_train_metrics:
+            train_r2, train_mae, _ = _regression_metrics(self.y_train, y_train_pred)
+            
+            print("Training Metrics:")
+            print(f"   R² Score:            {train_r2:.4f}")
+            print(f"   Mean Absolute Error: {train_mae:.4f}\n")
         
         print("Testing Metrics:")
         print(f"   R² Score:            {test_r2:.4f}")
         print(f"   Mean Absolute Error: {test_mae:.4f}")
         print(f"   Root Mean Sq Error:  {test_rmse:.4f}\n")
         
-        # Cross-validation
-        if len(self.X) >= 5:
-            cv_scores = cross_val_score(self.model, self.X, self.y, cv=min(5, len(self.X)), scoring='r2')
-            print(f"Cross-Validation (5-fold):")
+        # Cross-validation; on small datasets the extra refits add little over the test split
+        if self.streamed:
+            print("Cross-Validation: skipped (streamed training, see test metrics)\n")
+        elif len(self.X) < CV_MIN_SAMPLES:
+            print("Cross-Validation: skipped (small dataset, see test metrics)\n")
+        else:
+            # Run folds in parallel with single-threaded fits instead of nesting pools
+            cv_model = clone(self.model)
+            if 'n_jobs' in cv_model.get_params():
+                cv_model.set_params(n_jobs=1)
+            # CV is only a summary estimate, so cap its cost on large datasets
+            X_cv, y_cv = self.X, self.y
+            if len(self.X) > CV_MAX_SAMPLES:
+                idx = np.random.default_rng(42).choice(len(self.X), CV_MAX_SAMPLES, replace=False)
+                X_cv, y_cv = self.X[idx], self.y[idx]
+            # Keep at least ~20 samples per fold so each fold's score is representative
+            n_splits = min(5, len(X_cv) // 20)
+            cv = KFold(n_splits=n_splits, shuffle=True, random_state=42)
+            cv_scores = cross_val_score(cv_model, X_cv, y_cv, cv=cv, scoring='r2',
+                                        n_jobs=-1, pre_dispatch='2*n_jobs')
+            sampled = f", {len(X_cv)} of {len(self.X)} samples" if len(X_cv) < len(self.X) else ""
+            print(f"Cross-Validation ({n_splits}-fold{sampled}):")
             print(f"   Mean R² Score:       {cv_scores.mean():.4f}")
             print(f"   Std Deviation:       {cv_scores.std():.4f}\n")
         
@@ -127,10 +416,11 @@ class EnergyModelTrainer:
         if hasattr(self.model, 'feature_importances_'):
             print("🎯 Feature Importance:")
             features = ["CPU Usage", "Memory Usage", "Execution Time"]
-            importances = self.model.feature_importances_
-            for feat, imp in sorted(zip(features, importances), key=lambda x: x[1], reverse=True):
-                bar = "█" * int(imp * 50)
-                print(f"   {feat:20s} {imp:.4f} {bar}")
+            importances = np.asarray(self.model.feature_importances_)
+            lengths = (importances * 50).astype(np.int32)
+            order = np.argsort(-importances, kind='stable')
+            print("\n".join(f"   {features[i]:20s} {importances[i]:.4f} {BAR[:lengths[i]]}"
+                            for i in order.tolist()))
             print()
         
         # Model quality assessment
@@ -150,31 +440,124 @@ class EnergyModelTrainer:
         # Create models directory
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # Save model
-        joblib.dump(self.model, output_path)
+        # Save model: lz4 when installed (fast to load), zlib otherwise
+        try:
+            import lz4
+            compress = ('lz4', 3)
+        except ImportError:
+            compress = 3
+        joblib.dump(self.model, output_path, compress=compress, protocol=5)
         
         file_size = os.path.getsize(output_path) / 1024
         print(f"💾 Model saved successfully!")
         print(f"   Path: {output_path}")
         print(f"   Size: {file_size:.2f} KB\n")
+        
+        self.export_onnx(os.path.splitext(output_path)[0] + ".onnx")
+        self.export_forest(os.path.splitext(output_path)[0] + ".forest.npz")
     
-    def run_full_pipeline(self):
+    def export_onnx(self, onnx_path):
+        """Write an ONNX copy of the model for onnxruntime inference, if skl2onnx is installed"""
+        try:
+            from skl2onnx import to_onnx
+        except ImportError:
+            return False
+        
+        try:
+            onx = to_onnx(self.model, self.X_train[:1].astype(np.float32), target_opset=17)
+        except Exception as e:
+            print(f"⚠️  ONNX export skipped: {e}\n")
+            return False
+        # Written after the pickle, so the analyzer sees it as up to date
+        with open(onnx_path, "wb") as f:
+            f.write(onx.SerializeToString())
+        
+        print(f"📦 ONNX export: {onnx_path} ({os.path.getsize(onnx_path) / 1024:.2f} KB)\n")
+        return True
+    
+    def export_forest(self, forest_path):
+        """Flatten a random forest into concatenated node arrays for the Numba predictor"""
+        if self.model_type != "random_forest":
+            return False
+        
+        trees = [est.tree_ for est in self.model.estimators_]
+        sizes = np.array([t.node_count for t in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+        
+        def children(side):
+            # Shift child ids to global node indices; leaves stay at -1
+            return np.concatenate([
+                np.where(c == -1, -1, c + off)
+                for c, off in zip((getattr(t, side) for t in trees), offsets)
+            ]).astype(np.int32)
+        
+        forest = {
+            "feature": np.concatenate([t.feature for t in trees]).astype(np.int32),
+            # sklearn compares float32 inputs against float64 thresholds; keep that exact
+            "threshold": np.concatenate([t.threshold for t in trees]).astype(np.float64),
+            "left": children("children_left"),
+            "right": children("children_right"),
+            "value": np.concatenate([t.value[:, 0, 0] for t in trees]).astype(np.float64),
+            "roots": offsets
+        }
+        self._quantize_thresholds(forest)
+        np.savez(forest_path, **forest)
+        
+        kind = "int16 thresholds" if "qthreshold" in forest else "float thresholds"
+        print(f"🌲 Forest export: {forest_path} ({len(trees)} trees, {int(sizes.sum())} nodes, {kind})\n")
+        return True
+    
+    def _quantize_thresholds(self, forest):
+        """Replace float split thresholds with int16 indices into per-feature threshold tables"""
+        feature, threshold = forest["feature"], forest["threshold"]
+        splits = feature >= 0
+        masks = [splits & (feature == f) for f in range(self.X_train.shape[1])]
+        edges = [np.unique(threshold[mask]) for mask in masks]
+        if max(map(len, edges), default=0) > np.iinfo(np.int16).max:
+            return
+        
+        # Leaves are never compared, so their entries can stay 0
+        qthreshold = np.zeros(len(threshold), dtype=np.int16)
+        for mask, edges_f in zip(masks, edges):
+            qthreshold[mask] = np.searchsorted(edges_f, threshold[mask])
+        
+        forest["qthreshold"] = qthreshold
+        forest["edges"] = np.concatenate(edges)
+        forest["edge_offsets"] = np.concatenate([[0], np.cumsum([len(e) for e in edges])]).astype(np.int64)
+        del forest["threshold"]
+    
+    def run_full_pipeline(self, model_type=None, compare=False, stream=False):
         """Execute complete training pipeline"""
+        if model_type is not None:
+            self.model_type = model_type
+        
         print("=" * 70)
         print("🚀 ENERGY MODEL TRAINING PIPELINE")
         print("=" * 70)
         print()
         
-        # Step 1: Load data
-        if not self.load_data():
-            return False
-        
-        # Step 2: Prepare features
-        self.prepare_features()
-        
-        # Step 3: Train model
-        if not self.train_model():
-            return False
+        if stream:
+            # Steps 1-3 in bounded memory: each chunk is checked before it is fitted
+            from sklearn import set_config
+            set_config(assume_finite=True)
+            if not self.train_streaming():
+                return False
+        else:
+            # Step 1: Load data
+            if not self.load_data():
+                return False
+            
+            # Step 2: Prepare features
+            if not self.prepare_features():
+                return False
+            
+            # Data was checked once above, so skip sklearn's per-call finite checks
+            from sklearn import set_config
+            set_config(assume_finite=True)
+            
+            # Step 3: Train model (or pick the best of all of them)
+            if not (self.compare_models() if compare else self.train_model()):
+                return False
         
         # Step 4: Evaluate
         self.evaluate_model()
@@ -196,20 +579,26 @@ class EnergyModelTrainer:
 
 def main():
     """CLI entry point"""
-    # Parse arguments
-    model_type = "random_forest"
-    if len(sys.argv) > 1:
-        if sys.argv[1] in ["random_forest", "gradient_boosting", "linear"]:
-            model_type = sys.argv[1]
-        else:
-            print("Usage: python train_model.py [model_type]")
-            print("Model types: random_forest, gradient_boosting, linear")
-            print("Default: random_forest")
-            sys.exit(1)
+    # Parse arguments before any heavy import
+    parser = argparse.ArgumentParser(description="Train the energy cost model")
+    parser.add_argument("model_type", nargs="?", default="random_forest", choices=MODEL_TYPES,
+                        help="model to train (default: random_forest)")
+    parser.add_argument("--train-metrics", action="store_true",
+                        help="also report R²/MAE on the training split")
+    # Comparison needs the whole table in memory, which streaming avoids
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--compare", action="store_true",
+                      help="train every model type in parallel and save the best")
+    mode.add_argument("--stream", action="store_true",
+                      help=f"read the CSV in {STREAM_CHUNKSIZE}-row chunks and add "
+                           f"{TREES_PER_CHUNK} trees per chunk with warm_start (at least "
+                           f"{STREAM_MIN_TREES} trees in total; random_forest/gradient_boosting only)")
+    args = parser.parse_args()
     
     # Train model
-    trainer = EnergyModelTrainer(model_type=model_type)
-    success = trainer.run_full_pipeline()
+    trainer = EnergyModelTrainer(model_type=args.model_type,
+                                 verbose_train_metrics=args.train_metrics)
+    success = trainer.run_full_pipeline(compare=args.compare, stream=args.stream)
     
     sys.exit(0 if success else 1)
 